@@ -1,24 +1,193 @@
+import numpy as np
 import pandas as pd
 import openpyxl
+from openpyxl.styles import Font
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 from datetime import datetime
+from functools import lru_cache
+from hashlib import blake2b
+from concurrent.futures import ProcessPoolExecutor
 import os
+import sys
+import json
 import glob
+import re
+import logging
 import warnings
 
+try:
+    import ahocorasick  # pyahocorasick, optional fast path for categorization
+except ImportError:
+    ahocorasick = None
+
+try:
+    import pyarrow  # optional, multithreaded CSV parser for pandas
+except ImportError:
+    pyarrow = None
+
+try:
+    import python_calamine  # optional, Rust xlsx reader behind pandas' calamine engine
+except ImportError:
+    python_calamine = None
+
 # Suppress openpyxl UserWarning about default style
 warnings.filterwarnings("ignore", "Workbook contains no default style", UserWarning)
 
+# Progress messages, configured to plain lines on stdout when run as a script
+log = logging.getLogger(__name__)
+
+# Workbook updated by every processor
+EXCEL_FILE = "LISTE DES OPÉRATIONS-2025.xlsm"
+
+# Duplicate-check keys of the workbook sheets as of the last run, reused while the workbook is unchanged
+STATE_FILE = ".duplicate_keys.json"
+
+# Statement input files and the CSV columns read from them
+ACCOUNT_STATEMENT_PATTERN = "account-statement_*.csv"
+ACCOUNT_COLUMNS = ['Type', 'Completed Date', 'Description', 'Amount']
+TRANSACTIONS_FILE = "transactions.csv"
+TRANSACTION_COLUMNS = ['Booking date', 'Merchant', 'Type', 'Amount (CHF)']
+
+# Input DataFrames read ahead of time by preload_statements(), keyed by file name
+_preloaded_frames = {}
+
+# Formatted date strings per calendar day, filled by format_dates()
+_date_strings = {}
+
+# Duplicate-check keys of every row of the scanned sheets, keyed by sheet title,
+# filled by load_existing_keys() or load_sheet_state()
+_sheet_keys = {}
+
+# Shared font for the oldest new transactions
+_BOLD_FONT = Font(bold=True)
+
+# Bank operation categorization based on VBA logic, built once at import
+_BANK_CATS = (
+    # (search_term, cleaned_name, category, sub_category)
+    ("Distalmotion", None, "Salary", ""),
+    ("Duol", None, "Chant Cred", "Duol"),
+    ("INSTITUT LE CHATELARD", None, "Chant Cred", "Chatelard"),
+    ("Leni", None, "Kids Deb", ""),
+    ("Assura-Basis", None, "Health", ""),
+    ("Etat de Vaud Impôts", None, "Impot", ""),
+    ("Swisscom ", None, "Media", ""),
+    ("Sunrise", None, "Media", ""),
+    ("Salt", None, "Media", ""),
+    ("Koloristika", None, "Chant", ""),
+    ("Planchamp, Xavier", None, "Rent", ""),
+    ("Baptiste Dujardin", None, "Food", ""),
+    ("Caisse de pensions de", "Parking", "Car", ""),
+    ("PPE LE CAMPUS", None, "Home Crosets", ""),
+    ("Romande Energie SA", None, "Home", ""),
+    ("Energiapro SA", None, "Home", ""),
+    ("PPE SUNDANCE", None, "Home Crosets", ""),
+    ("Caisse AVS de la Feder", None, "Alloc", ""),
+)
+
+# Merchant cleanup and categorization based on VBA logic, built once at import
+_MERCHANT_CATS = (
+    # (search_term, cleaned_name, category)
+    ("Migros", "Migros", "Food"),
+    ("Aldi", "Aldi", "Food"),
+    ("Denner", "Denner", "Food"),
+    ("LAUSANNE10", "LAUSANNE10", "Food"),
+    ("Manor", "Manor", "Food"),
+    ("Coop", "Coop", "Food"),
+    ("Jumbo", "Jumbo", "Home"),
+    ("L'Instant Chocolat", "L'Instant Chocolat", "Food"),
+    ("APPLE.COM", "APPLE.COM", "Media"),
+    ("THE NEW YORK TIMES", "THE NEW YORK TIMES", "Media"),
+    ("THE ATHLETIC", "THE ATHLETIC", "Media"),
+    ("Tesla", "Tesla", "Car"),
+    ("Prime Video", "Prime Video", "Media"),
+    ("Sun Store", "Pharmacie-Sunstore", "Health"),
+    ("Pharmacie-Sunstore", "Pharmacie-Sunstore", "Health"),
+    ("Droguerie Jaquet", "Droguerie Jaquet", "Health"),
+    ("Sakura Sushi", "Sakura Sushi", "Food"),
+    ("Boutique Ravann", "Boutique Ravann", "Food"),
+    ("SBB CFF", "SBB CFF", "Transport"),
+    ("Brezelkönig", "Brezelkönig", "Food"),
+    ("Zalando", "Zalando", "Clothing"),
+    ("BestDrive", "BestDrive", "Car"),
+    ("KymeM Cafe", "KymeM Cafe", "Restaurant"),
+    ("Pizzeria Vecchia", "Pizzeria Vecchia Napoli", "Restaurant"),
+    ("NETFLIX.COM", "NETFLIX.COM", "Media"),
+    ("Netflix.com", "NETFLIX.COM", "Media"),
+    ("Salt", "Salt Mobile SA", "Media"),
+    ("salt.ch", "Salt Mobile SA", "Media"),
+    ("Patreon", "Patreon", "Media"),
+    ("Association Golf de La Puidoux", "Association Golf de La Puidoux", "Hobby"),
+    ("Exotic Food Center", "Exotic Food Center", "Food"),
+    ("Aux Merveilleux", "Aux Merveilleux", "Food"),
+    ("Appunto Rest.", "Appunto Rest.", "Food"),
+    ("QoQa Services SA", "QoQa", "?"),
+    ("DAZN", "DAZN", "Media"),
+    ("URUMQI", "URUMQI", "Food"),
+    ("La Cavagne", "La Cavagne", "Food"),
+)
+
+def build_category_matcher(categories):
+    """
+    Compile the search terms of a category table into a single matcher
+    Uses an Aho-Corasick automaton with pyahocorasick, a compiled regex alternation otherwise
+    """
+    if ahocorasick is None:
+        # Group i + 1 captures the search term at table position i
+        return re.compile("|".join(f"({re.escape(entry[0])})" for entry in categories))
+    
+    automaton = ahocorasick.Automaton()
+    for priority, entry in enumerate(categories):
+        # Keep the first position if a search term is listed twice
+        if not automaton.exists(entry[0]):
+            automaton.add_word(entry[0], priority)
+    automaton.make_automaton()
+    return automaton
+
+_bank_matcher = build_category_matcher(_BANK_CATS)
+_merchant_matcher = build_category_matcher(_MERCHANT_CATS)
+
+def find_category(categories, matcher, text):
+    """
+    Find the first entry of a category table whose search term occurs in text
+    Returns the matching entry or None, with the same precedence as the table order
+    """
+    if isinstance(matcher, re.Pattern):
+        match = matcher.search(text)
+        if match is None:
+            return None
+        
+        # The leftmost match may come from a later entry than one matching further right
+        position = match.lastindex - 1
+        for entry in categories[:position]:
+            if entry[0] in text:
+                return entry
+        return categories[position]
+    
+    # Single scan over the text, the lowest table position wins
+    best = None
+    for _end, priority in matcher.iter(text):
+        if best is None or priority < best:
+            best = priority
+    return categories[best] if best is not None else None
+
 def clean_bank_operation_and_categorize(operation):
     """
     Clean bank operation name and assign category based on VBA logic for bank statements
     Returns tuple: (cleaned_operation, category, sub_category)
     """
-    # Convert to string and handle None values
-    if pd.isna(operation) or operation is None:
+    # Convert to string and handle None and NaN values (NaN is never equal to itself)
+    if operation is None or operation != operation:
         return "", "", ""
     
-    operation_str = str(operation)
-    
+    # Drop control characters openpyxl refuses to write, before the key is built from the name
+    return _categorize_bank_operation_cached(ILLEGAL_CHARACTERS_RE.sub("", str(operation)))
+
+@lru_cache(maxsize=8192)
+def _categorize_bank_operation_cached(operation_str):
+    """
+    Cached cleanup and categorization of a bank operation string
+    Recurring operations (salary, rent, utilities) are only matched once per run
+    """
     # Clean operation prefixes
     if "BCV-NET " in operation_str:
         operation_str = operation_str.replace("BCV-NET ", "")
@@ -27,34 +196,12 @@ def clean_bank_operation_and_categorize(operation):
     if "VIR TWINT " in operation_str:
         operation_str = operation_str.replace("VIR TWINT ", "")
     
-    # Bank operation categorization based on VBA logic
-    bank_categories = [
-        # (search_term, cleaned_name, category, sub_category)
-        ("Distalmotion", None, "Salary", ""),
-        ("Duol", None, "Chant Cred", "Duol"),
-        ("INSTITUT LE CHATELARD", None, "Chant Cred", "Chatelard"),
-        ("Leni", None, "Kids Deb", ""),
-        ("Assura-Basis", None, "Health", ""),
-        ("Etat de Vaud Impôts", None, "Impot", ""),
-        ("Swisscom ", None, "Media", ""),
-        ("Sunrise", None, "Media", ""),
-        ("Salt", None, "Media", ""),
-        ("Koloristika", None, "Chant", ""),
-        ("Planchamp, Xavier", None, "Rent", ""),
-        ("Baptiste Dujardin", None, "Food", ""),
-        ("Caisse de pensions de", "Parking", "Car", ""),
-        ("PPE LE CAMPUS", None, "Home Crosets", ""),
-        ("Romande Energie SA", None, "Home", ""),
-        ("Energiapro SA", None, "Home", ""),
-        ("PPE SUNDANCE", None, "Home Crosets", ""),
-        ("Caisse AVS de la Feder", None, "Alloc", ""),
-    ]
-    
-    # Check each bank operation pattern
-    for search_term, cleaned_name, category, sub_category in bank_categories:
-        if search_term in operation_str:
-            final_name = cleaned_name if cleaned_name else operation_str
-            return final_name, category, sub_category
+    # Check bank operation patterns
+    match = find_category(_BANK_CATS, _bank_matcher, operation_str)
+    if match:
+        _search_term, cleaned_name, category, sub_category = match
+        final_name = cleaned_name if cleaned_name else operation_str
+        return final_name, category, sub_category
     
     # If no match found, return cleaned operation with empty category
     return operation_str, "", ""
@@ -64,58 +211,24 @@ def clean_merchant_and_categorize(merchant):
     Clean merchant name and assign category based on VBA logic
     Returns tuple: (cleaned_merchant, category)
     """
-    # Convert to string and handle None values
-    if pd.isna(merchant) or merchant is None:
+    # Convert to string and handle None and NaN values (NaN is never equal to itself)
+    if merchant is None or merchant != merchant:
         return "", ""
     
-    merchant_str = str(merchant)
-    
-    # Merchant cleanup and categorization based on VBA logic
-    merchant_categories = [
-        # (search_term, cleaned_name, category)
-        ("Migros", "Migros", "Food"),
-        ("Aldi", "Aldi", "Food"),
-        ("Denner", "Denner", "Food"),
-        ("LAUSANNE10", "LAUSANNE10", "Food"),
-        ("Manor", "Manor", "Food"),
-        ("Coop", "Coop", "Food"),
-        ("Jumbo", "Jumbo", "Home"),
-        ("L'Instant Chocolat", "L'Instant Chocolat", "Food"),
-        ("APPLE.COM", "APPLE.COM", "Media"),
-        ("THE NEW YORK TIMES", "THE NEW YORK TIMES", "Media"),
-        ("THE ATHLETIC", "THE ATHLETIC", "Media"),
-        ("Tesla", "Tesla", "Car"),
-        ("Prime Video", "Prime Video", "Media"),
-        ("Sun Store", "Pharmacie-Sunstore", "Health"),
-        ("Pharmacie-Sunstore", "Pharmacie-Sunstore", "Health"),
-        ("Droguerie Jaquet", "Droguerie Jaquet", "Health"),
-        ("Sakura Sushi", "Sakura Sushi", "Food"),
-        ("Boutique Ravann", "Boutique Ravann", "Food"),
-        ("SBB CFF", "SBB CFF", "Transport"),
-        ("Brezelkönig", "Brezelkönig", "Food"),
-        ("Zalando", "Zalando", "Clothing"),
-        ("BestDrive", "BestDrive", "Car"),
-        ("KymeM Cafe", "KymeM Cafe", "Restaurant"),
-        ("Pizzeria Vecchia", "Pizzeria Vecchia Napoli", "Restaurant"),
-        ("NETFLIX.COM", "NETFLIX.COM", "Media"),
-        ("Netflix.com", "NETFLIX.COM", "Media"),
-        ("Salt", "Salt Mobile SA", "Media"),
-        ("salt.ch", "Salt Mobile SA", "Media"),
-        ("Patreon", "Patreon", "Media"),
-        ("Association Golf de La Puidoux", "Association Golf de La Puidoux", "Hobby"),
-        ("Exotic Food Center", "Exotic Food Center", "Food"),
-        ("Aux Merveilleux", "Aux Merveilleux", "Food"),
-        ("Appunto Rest.", "Appunto Rest.", "Food"),
-        ("QoQa Services SA", "QoQa", "?"),
-        ("DAZN", "DAZN", "Media"),
-        ("URUMQI", "URUMQI", "Food"),
-        ("La Cavagne", "La Cavagne", "Food"),
-    ]
-    
-    # Check each merchant pattern
-    for search_term, cleaned_name, category in merchant_categories:
-        if search_term in merchant_str:
-            return cleaned_name, category
+    # Drop control characters openpyxl refuses to write, before the key is built from the name
+    return _categorize_merchant_cached(ILLEGAL_CHARACTERS_RE.sub("", str(merchant)))
+
+@lru_cache(maxsize=8192)
+def _categorize_merchant_cached(merchant_str):
+    """
+    Cached cleanup and categorization of a merchant string
+    The same merchants recur across statements, so most rows are cache hits
+    """
+    # Check merchant patterns
+    match = find_category(_MERCHANT_CATS, _merchant_matcher, merchant_str)
+    if match:
+        _search_term, cleaned_name, category = match
+        return cleaned_name, category
     
     # If no match found, return original merchant with empty category
     return merchant_str, ""
@@ -123,305 +236,510 @@ def clean_merchant_and_categorize(merchant):
 def parse_date(date_str):
     """
     Parse date from DD-MM-YYYY format to datetime object
+    Also accepts DD.MM.YYYY, YYYY-MM-DD, DD/MM/YYYY and MM/DD/YYYY
     """
     try:
-        # Try different date formats
         if isinstance(date_str, datetime):
             return date_str
         
         date_str = str(date_str).strip()
         
-        # Try DD-MM-YYYY format (from CSV)
-        try:
-            return datetime.strptime(date_str, "%d-%m-%Y")
-        except:
-            pass
-            
-        # Try DD.MM.YYYY format (from Excel)
-        try:
-            return datetime.strptime(date_str, "%d.%m.%Y")
-        except:
-            pass
-            
-        # Try other common formats
-        for fmt in ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"]:
+        # Pick the format from the separator instead of trying each one in turn,
+        # a string can only match the formats using its separator
+        if "." in date_str:
+            formats = ("%d.%m.%Y",)  # from Excel
+        elif "/" in date_str:
+            formats = ("%d/%m/%Y", "%m/%d/%Y")
+        elif date_str.find("-") == 4:
+            formats = ("%Y-%m-%d",)
+        elif "-" in date_str:
+            formats = ("%d-%m-%Y",)  # from CSV
+        else:
+            return None
+        
+        for fmt in formats:
             try:
                 return datetime.strptime(date_str, fmt)
-            except:
+            except ValueError:
                 continue
-                
+        
         return None
     except:
         return None
 
-def process_account_statements():
+# Same formats and order as parse_date
+DATE_FORMATS = ["%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"]
+
+def parse_date_column(column):
     """
-    Process account statements from CSV files starting with 'account-statement_'
+    Parse a whole DataFrame column of dates with the formats used by parse_date
+    Returns a datetime Series with NaT where no format matches
     """
-    # Find all account statement CSV files
-    account_files = glob.glob("account-statement_*.csv")
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
     
-    if not account_files:
-        print("No account statement CSV files found matching pattern 'account-statement_*.csv'")
+    # Strip strings, datetime values are accepted as-is by every format
+    values = column.map(lambda value: value.strip() if isinstance(value, str) else value)
+    
+    parsed = pd.to_datetime(values, format=DATE_FORMATS[0], errors="coerce")
+    for fmt in DATE_FORMATS[1:]:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(values[missing], format=fmt, errors="coerce"))
+    return parsed
+
+def format_iso_date(date):
+    """
+    Format a date or datetime as yyyy-mm-dd, as used in the duplicate-check keys
+    Builds the string from the date fields, which is faster than strftime
+    """
+    return f"{date.year:04d}-{date.month:02d}-{date.day:02d}"
+
+def format_display_date(date):
+    """
+    Format a date or datetime as dd.mm.yyyy, as written to the sheets
+    """
+    return f"{date.day:02d}.{date.month:02d}.{date.year:04d}"
+
+def format_dates(date):
+    """
+    Return the (yyyy-mm-dd, dd.mm.yyyy) strings of a date or datetime
+    Formatted once per calendar day and shared by every processor
+    """
+    day = (date.year, date.month, date.day)
+    strings = _date_strings.get(day)
+    if strings is None:
+        strings = _date_strings[day] = (format_iso_date(date), format_display_date(date))
+    return strings
+
+def read_statement_csv(csv_file, columns):
+    """
+    Read only the given columns of a statement CSV file
+    Uses the pyarrow parser when it is installed
+    """
+    if csv_file in _preloaded_frames:
+        return _preloaded_frames.pop(csv_file)
+    if pyarrow is None:
+        return pd.read_csv(csv_file, usecols=columns)
+    return pd.read_csv(csv_file, usecols=columns, engine="pyarrow")
+
+def read_bank_statement(input_file):
+    """
+    Read the date, operation, debit and credit columns (A:D) of a bank statement file
+    Uses the calamine engine when it is installed, openpyxl in read-only mode otherwise
+    """
+    if input_file in _preloaded_frames:
+        return _preloaded_frames.pop(input_file)
+    if python_calamine is None:
+        return pd.read_excel(input_file, header=8, usecols="A:D", engine="openpyxl",
+                             engine_kwargs={"read_only": True, "data_only": True})  # Row 9 contains data
+    return pd.read_excel(input_file, header=8, usecols="A:D", engine="calamine")  # Row 9 contains data
+
+def find_bank_statement_files():
+    """
+    Find the bank statement files, named 'LISTE DES OPÉRATIONS [dd-mm-yyyy].xlsx'
+    """
+    input_files = glob.glob("LISTE DES OPÉRATIONS *.xlsx")
+    
+    # Filter files that actually contain brackets in the name
+    return [f for f in input_files if '[' in f and ']' in f]
+
+def preload_statements(executor):
+    """
+    Submit every statement input file to a process pool so they are read at the same time
+    Returns the futures keyed by file name, collected by store_preloaded_statements()
+    """
+    jobs = [(read_statement_csv, csv_file, ACCOUNT_COLUMNS) for csv_file in glob.glob(ACCOUNT_STATEMENT_PATTERN)]
+    if os.path.exists(TRANSACTIONS_FILE):
+        jobs.append((read_statement_csv, TRANSACTIONS_FILE, TRANSACTION_COLUMNS))
+    # Only the first bank statement file is processed
+    jobs += [(read_bank_statement, input_file) for input_file in find_bank_statement_files()[:1]]
+    
+    log.info(f"Reading {len(jobs)} statement files in parallel...")
+    return {job[1]: executor.submit(*job) for job in jobs}
+
+def store_preloaded_statements(futures):
+    """
+    Keep the DataFrames read by preload_statements() for the processors
+    """
+    for input_file, future in futures.items():
+        try:
+            _preloaded_frames[input_file] = future.result()
+        except Exception as e:
+            # Left to the processor, which reads the file again and reports the error
+            log.error(f"Could not read {input_file} in parallel: {str(e)}")
+
+def find_last_row(worksheet):
+    """
+    Find the last row with a value in column A, or 1 if there is none
+    Walks back from max_row instead of reading every row of the sheet
+    """
+    last_row = worksheet.max_row
+    while last_row > 1 and worksheet.cell(row=last_row, column=1).value is None:
+        last_row -= 1
+    return last_row
+
+def make_key(date_str, name, *amounts):
+    """
+    Build the duplicate-check key for a date (yyyy-mm-dd), a name and its amounts
+    The fields are hashed to a 16-byte digest so the sets only hold small bytes keys
+    """
+    # Amounts are floats already, adding 0.0 gives -0.0 the same key as 0.0
+    fields = [date_str, name] + [repr(amount + 0.0) for amount in amounts]
+    return blake2b("\x1f".join(fields).encode(), digest_size=16).digest()
+
+def sheet_row_key(date_val, name_val, amount_vals):
+    """
+    Build the duplicate-check key of a sheet row from its date, name and amount cells
+    Returns None for rows that cannot match, like the header or non-numeric amounts
+    """
+    if not (date_val and name_val and any(amount_vals)):
+        return None
+    
+    try:
+        amount_floats = tuple(float(amount_val) if amount_val else 0.0 for amount_val in amount_vals)
+    except (ValueError, TypeError):
+        return None
+    
+    # Convert date to string for comparison
+    if isinstance(date_val, datetime):
+        date_str = format_dates(date_val)[0]
+    else:
+        date_str = str(date_val)
+    
+    return make_key(date_str, str(name_val), *amount_floats)
+
+def load_existing_keys(worksheet, amount_columns, max_row=None, min_date=None):
+    """
+    Build the duplicate-check set from the rows already in a worksheet
+    Keys are made from the date, name and amounts in column A, B and the following amount columns
+    Rows dated before min_date are left out since no new transaction can match them
+    The keys saved by the last run are reused when the sheet has not changed since
+    """
+    # max_row is recomputed from every cell on each access, so it is read at most once
+    if max_row is None:
+        max_row = worksheet.max_row
+    
+    state = _sheet_keys.get(worksheet.title)
+    if state is not None and state['amount_columns'] == amount_columns and state['last_row'] == max_row:
+        log.info(f"Reusing {len(state['keys'])} saved duplicate keys for {worksheet.title} sheet")
+        return set(state['keys'])
+    
+    # A plain set of 16-byte digests, already one hash per lookup, a Bloom filter in front
+    # of it would only add work in Python
+    existing_data = set()
+    sheet_keys = set()
+    _sheet_keys[worksheet.title] = {'amount_columns': amount_columns, 'last_row': max_row, 'keys': sheet_keys}
+    if max_row <= 1:
+        # Empty sheet or header only
+        return existing_data
+    
+    # The workbook is already loaded for writing, reading its values in place is cheaper
+    # than parsing the file a second time in read-only mode
+    for date_val, name_val, *amount_vals in worksheet.iter_rows(min_row=1, max_row=max_row, max_col=2 + amount_columns, values_only=True):
+        key = sheet_row_key(date_val, name_val, amount_vals)
+        if key is None:
+            continue
+        
+        # Every row is kept for the saved state, older rows are left out of the check
+        sheet_keys.add(key)
+        if min_date is not None and isinstance(date_val, datetime) and date_val.date() < min_date:
+            continue
+        existing_data.add(key)
+    
+    return existing_data
+
+def remember_sheet_row(worksheet, row, values, amount_columns):
+    """
+    Add a row just written to a sheet scanned by load_existing_keys() to its saved keys
+    """
+    state = _sheet_keys.get(worksheet.title)
+    if state is None:
         return
     
-    print(f"Found {len(account_files)} account statement files: {account_files}")
+    key = sheet_row_key(values[0], values[1], values[2:2 + amount_columns])
+    if key is not None:
+        state['keys'].add(key)
+    state['last_row'] = max(state['last_row'], row)
+
+def load_sheet_state(excel_file):
+    """
+    Load the sheet keys saved by the last run, if the workbook has not changed since
+    A state file that cannot be read or used is ignored and the sheets are scanned
+    """
+    _sheet_keys.clear()
+    if not os.path.exists(STATE_FILE):
+        return
     
-    # Use hardcoded Excel file
-    excel_file = "LISTE DES OPÉRATIONS-2025.xlsm"
+    try:
+        with open(STATE_FILE, encoding="utf-8") as state_file:
+            state = json.load(state_file)
+        if not isinstance(state, dict):
+            raise ValueError("unexpected content")
+        
+        # Any save from Excel changes the modification time, so the keys would be stale
+        stat = os.stat(excel_file)
+        if state.get('workbook') != [excel_file, stat.st_mtime_ns, stat.st_size]:
+            return
+        
+        sheets = {}
+        for title, sheet in state['sheets'].items():
+            sheets[title] = {
+                'amount_columns': int(sheet['amount_columns']),
+                'last_row': int(sheet['last_row']),
+                'keys': {bytes.fromhex(key) for key in sheet['keys']}
+            }
+    except Exception as e:
+        log.error(f"Could not use {STATE_FILE}, sheets will be scanned: {str(e)}")
+        return
     
-    if not os.path.exists(excel_file):
-        print(f"Excel file {excel_file} not found!")
+    _sheet_keys.update(sheets)
+
+def save_sheet_state(excel_file):
+    """
+    Save the sheet keys, as hex strings, along with the workbook's modification time and size
+    """
+    stat = os.stat(excel_file)
+    sheets = {
+        title: {
+            'amount_columns': sheet['amount_columns'],
+            'last_row': sheet['last_row'],
+            'keys': sorted(key.hex() for key in sheet['keys'])
+        }
+        for title, sheet in _sheet_keys.items()
+    }
+    with open(STATE_FILE, "w", encoding="utf-8") as state_file:
+        json.dump({'workbook': [excel_file, stat.st_mtime_ns, stat.st_size], 'sheets': sheets}, state_file)
+
+def write_row(worksheet, row, values, append=False, number_format=None):
+    """
+    Write a tuple of values to a row starting at column A, skipping None values
+    Rows are placed explicitly since append() would start after max_row, not the last used row
+    Sheets created by this script have no trailing rows, so they can use append() directly
+    number_format, if given, is applied to the first cell of the row
+    """
+    if append:
+        worksheet.append(values)
+        if number_format is not None:
+            worksheet.cell(row=row, column=1).number_format = number_format
         return
     
-    print(f"Using Excel file: {excel_file}")
+    start = 1
+    if number_format is not None:
+        # Write and format the first cell with a single lookup
+        worksheet.cell(row=row, column=1, value=values[0]).number_format = number_format
+        start = 2
+    for column, value in enumerate(values[start - 1:], start=start):
+        if value is not None:
+            worksheet.cell(row=row, column=column, value=value)
+
+def make_rows_bold(worksheet, bold_rows):
+    """
+    Apply the shared bold font to (row, columns) pairs once all rows are written
+    """
+    for row, columns in bold_rows:
+        for column in columns:
+            worksheet.cell(row=row, column=column).font = _BOLD_FONT
+
+def process_account_statements(workbook):
+    """
+    Process account statements from CSV files starting with 'account-statement_'
+    New transactions are added to the Revolut sheet of the given workbook
+    Returns the number of rows written, 0 if the workbook was left untouched,
+    or None if processing failed after writing to it had started
+    """
+    # Find all account statement CSV files
+    account_files = glob.glob(ACCOUNT_STATEMENT_PATTERN)
+    
+    if not account_files:
+        log.info(f"No account statement CSV files found matching pattern '{ACCOUNT_STATEMENT_PATTERN}'")
+        return 0
+    
+    log.info(f"Found {len(account_files)} account statement files: {account_files}")
     
     # Process all account statement files
     all_transactions = []
     
     for csv_file in account_files:
         try:
-            print(f"Processing {csv_file}...")
-            df = pd.read_csv(csv_file)
+            log.info(f"Processing {csv_file}...")
+            df = read_statement_csv(csv_file, ACCOUNT_COLUMNS)
             
             # Filter for "Card Payment" rows only
-            card_payments = df[df['Type'] == 'Card Payment']
+            card_payments = df.loc[df['Type'].values == 'Card Payment']
+            
+            # Parse completed dates from column D and amounts from column F in one pass
+            # Expected date format: "2025-11-13 14:07:59", amounts are made positive
+            card_payments = card_payments.assign(
+                completed_date=pd.to_datetime(card_payments['Completed Date'], format="%Y-%m-%d %H:%M:%S", errors="coerce"),
+                positive_amount=pd.to_numeric(card_payments['Amount'], errors="coerce").abs()
+            )
+            
+            # Drop rows with a missing or malformed date, merchant (column E) or amount
+            card_payments = card_payments.dropna(subset=['completed_date', 'Description', 'positive_amount'])
+            
+            # Loop over plain arrays, dates converted to Python datetimes once per column
+            completed_dates = card_payments['completed_date'].dt.to_pydatetime()
+            merchants = card_payments['Description'].to_numpy()
+            amounts = card_payments['positive_amount'].tolist()
             
-            for _, row in card_payments.iterrows():
+            for completed_date, merchant, amount in zip(completed_dates, merchants, amounts):
                 try:
-                    # Get completed date from column D (index 3)
-                    completed_date_str = row['Completed Date']
-                    if pd.isna(completed_date_str):
-                        continue
-                    
-                    # Parse date and convert to dd.mm.yyyy format (remove time)
-                    # Expected format: "2025-11-13 14:07:59"
-                    completed_date = datetime.strptime(completed_date_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    # Get merchant from column E (Description)
-                    merchant = row['Description']
-                    if pd.isna(merchant):
-                        continue
-                    
-                    # Get amount from column F and make it positive
-                    amount = row['Amount']
-                    if pd.isna(amount):
-                        continue
-                    
-                    amount = abs(float(amount))  # Make positive
-                    
                     # Clean merchant and get category
                     cleaned_merchant, category = clean_merchant_and_categorize(merchant)
                     
+                    # Build the duplicate-check key (yyyy-mm-dd date) and the dd.mm.yyyy date once per day
+                    date_iso, date_disp = format_dates(completed_date)
                     all_transactions.append({
                         'date': completed_date,
+                        'key': make_key(date_iso, cleaned_merchant, amount),
+                        'date_disp': date_disp,
                         'merchant': cleaned_merchant,
                         'amount': amount,
-                        'category': category
+                        'category': category or None
                     })
                     
                 except Exception as e:
-                    print(f"Error processing row in {csv_file}: {e}")
+                    log.error(f"Error processing row in {csv_file}: {e}")
                     continue
         
         except Exception as e:
-            print(f"Error reading {csv_file}: {e}")
+            log.error(f"Error reading {csv_file}: {e}")
             continue
     
-    print(f"Processed {len(all_transactions)} card payment transactions from account statements")
+    log.info(f"Processed {len(all_transactions)} card payment transactions from account statements")
     
     if not all_transactions:
-        print("No card payment transactions found to process")
-        return
+        log.info("No card payment transactions found to process")
+        return 0
     
     # Sort transactions from newest to oldest
     all_transactions.sort(key=lambda x: x['date'], reverse=True)
     
     try:
-        # Load Excel file
-        print(f"Loading {excel_file}...")
-        workbook = openpyxl.load_workbook(excel_file, keep_vba=True)
-        
         # Create or get Revolut worksheet
         revolut_sheet_name = "Revolut"
-        if revolut_sheet_name in workbook.sheetnames:
+        is_new_sheet = revolut_sheet_name not in workbook.sheetnames
+        if not is_new_sheet:
             worksheet = workbook[revolut_sheet_name]
         else:
             worksheet = workbook.create_sheet(revolut_sheet_name)
             # Add headers to Revolut sheet
-            worksheet['A1'] = "Date"
-            worksheet['B1'] = "Merchant"
-            worksheet['C1'] = "Amount"
-            worksheet['D1'] = "Category"
-            worksheet['E1'] = "Reason"
+            worksheet.append(["Date", "Merchant", "Amount", "Category", "Reason"])
         
         # Create or get duplicates worksheet
         duplicate_sheet_name = "Duplicates"
-        if duplicate_sheet_name in workbook.sheetnames:
+        is_new_duplicate_sheet = duplicate_sheet_name not in workbook.sheetnames
+        if not is_new_duplicate_sheet:
             duplicate_worksheet = workbook[duplicate_sheet_name]
         else:
             duplicate_worksheet = workbook.create_sheet(duplicate_sheet_name)
             # Add headers to duplicate sheet
-            duplicate_worksheet['A1'] = "Date"
-            duplicate_worksheet['B1'] = "Merchant"
-            duplicate_worksheet['C1'] = "Amount"
-            duplicate_worksheet['D1'] = "Category"
-            duplicate_worksheet['E1'] = "Reason"
+            duplicate_worksheet.append(["Date", "Merchant", "Amount", "Category", "Reason"])
         
         # Find the last row with data in column A
-        last_row = 1
-        for row in range(1, worksheet.max_row + 1):
-            if worksheet[f'A{row}'].value is not None:
-                last_row = row
-        
-        print(f"Found {last_row} existing rows in Excel")
-        
-        # Get existing data for duplicate check
-        existing_data = set()
-        for row in range(1, last_row + 1):
-            date_val = worksheet[f'A{row}'].value
-            merchant_val = worksheet[f'B{row}'].value
-            amount_val = worksheet[f'C{row}'].value
-            
-            if date_val and merchant_val and amount_val:
-                # Skip header row or non-numeric amounts
-                try:
-                    amount_float = float(amount_val)
-                except (ValueError, TypeError):
-                    continue
-                
-                # Convert date to string for comparison
-                if isinstance(date_val, datetime):
-                    date_str = date_val.strftime("%Y-%m-%d")
-                else:
-                    date_str = str(date_val)
-                
-                existing_data.add((date_str, str(merchant_val), amount_float))
+        last_row = find_last_row(worksheet)
+        
+        log.info(f"Found {last_row} existing rows in Excel")
+        
+        # Get existing data for duplicate check, only as far back as the oldest transaction
+        oldest_transaction_date = all_transactions[-1]['date'].date()
+        existing_data = load_existing_keys(worksheet, amount_columns=1, max_row=last_row, min_date=oldest_transaction_date)
         
         # Find last row in duplicate sheet
-        duplicate_last_row = 1
-        for row in range(1, duplicate_worksheet.max_row + 1):
-            if duplicate_worksheet[f'A{row}'].value is not None:
-                duplicate_last_row = row
+        duplicate_last_row = find_last_row(duplicate_worksheet)
         
         # Add new transactions (avoiding duplicates)
-        new_transactions_added = 0
-        duplicates_found = 0
         next_row = last_row + 1
         next_duplicate_row = duplicate_last_row + 1
         
-        # Find oldest transaction date among new transactions to add
-        new_transactions_to_add = []
+        # Key new transactions by their duplicate-check key in a single pass,
+        # repeats of an existing or already accepted key go to the duplicate sheet
+        new_transactions = {}
+        duplicate_transactions = []
         for transaction in all_transactions:
-            trans_tuple = (
-                transaction['date'].strftime("%Y-%m-%d"),
-                transaction['merchant'],
-                float(transaction['amount'])
-            )
-            if trans_tuple not in existing_data:
-                new_transactions_to_add.append(transaction)
+            key = transaction['key']
+            if key in existing_data or key in new_transactions:
+                duplicate_transactions.append(transaction)
+            else:
+                new_transactions[key] = transaction
         
-        oldest_date = min([t['date'] for t in new_transactions_to_add]) if new_transactions_to_add else None
+        new_transactions_added = len(new_transactions)
+        duplicates_found = len(duplicate_transactions)
         
-        for transaction in all_transactions:
-            # Create tuple for duplicate check
-            trans_tuple = (
-                transaction['date'].strftime("%Y-%m-%d"),
+        # Find oldest transaction date among new transactions to add
+        oldest_date = min((t['date'] for t in new_transactions.values()), default=None)
+        
+        # Add to duplicate sheet
+        for transaction in duplicate_transactions:
+            write_row(duplicate_worksheet, next_duplicate_row, (
+                transaction['date_disp'],
                 transaction['merchant'],
-                float(transaction['amount'])
+                transaction['amount'],
+                transaction['category'],
+                "Duplicate from account statement"
+            ), append=is_new_duplicate_sheet, number_format='@')  # Force text format on the date
+            next_duplicate_row += 1
+        
+        # Add to main Excel sheet, category in column E if it exists
+        bold_rows = []
+        for transaction in new_transactions.values():
+            row_values = (
+                transaction['date_disp'],
+                transaction['merchant'],
+                transaction['amount'],
+                None,
+                transaction['category']
             )
+            write_row(worksheet, next_row, row_values, append=is_new_sheet, number_format='@')  # Force text format on the date
+            remember_sheet_row(worksheet, next_row, row_values, amount_columns=1)
             
-            # Check if duplicate
-            if trans_tuple in existing_data:
-                # Add to duplicate sheet
-                date_str = transaction['date'].strftime("%d.%m.%Y")
-                duplicate_worksheet[f'A{next_duplicate_row}'] = date_str
-                duplicate_worksheet[f'A{next_duplicate_row}'].number_format = '@'  # Force text format
-                
-                duplicate_worksheet[f'B{next_duplicate_row}'] = transaction['merchant']
-                duplicate_worksheet[f'C{next_duplicate_row}'] = transaction['amount']
-                duplicate_worksheet[f'D{next_duplicate_row}'] = transaction['category']
-                duplicate_worksheet[f'E{next_duplicate_row}'] = "Duplicate from account statement"
-                duplicates_found += 1
-                next_duplicate_row += 1
-                continue
-            
-            # Add to main Excel sheet with dd.mm.yyyy format
-            date_str = transaction['date'].strftime("%d.%m.%Y")
-            worksheet[f'A{next_row}'] = date_str
-            worksheet[f'A{next_row}'].number_format = '@'  # Force text format
-            
-            worksheet[f'B{next_row}'] = transaction['merchant']
-            worksheet[f'C{next_row}'] = transaction['amount']
-            
-            # Add category in column E if it exists
-            if transaction['category']:
-                worksheet[f'E{next_row}'] = transaction['category']
-            
-            # Make oldest transactions bold
-            if oldest_date and transaction['date'] == oldest_date:
-                from openpyxl.styles import Font
-                bold_font = Font(bold=True)
-                worksheet[f'A{next_row}'].font = bold_font
-                worksheet[f'B{next_row}'].font = bold_font
-                worksheet[f'C{next_row}'].font = bold_font
-                if transaction['category']:
-                    worksheet[f'E{next_row}'].font = bold_font
-            
-            existing_data.add(trans_tuple)
-            new_transactions_added += 1
+            # Bold the date, merchant and amount, and the category only if it exists
+            if transaction['date'] == oldest_date:
+                bold_rows.append((next_row, (1, 2, 3) if transaction['category'] is None else (1, 2, 3, 5)))
             next_row += 1
         
-        # Save the workbook
-        print(f"Adding {new_transactions_added} new account statement transactions to Revolut sheet...")
-        workbook.save(excel_file)
-        workbook.close()
+        # Make oldest transactions bold
+        make_rows_bold(worksheet, bold_rows)
         
-        print(f"Account statement processing completed!")
-        print(f"Added {new_transactions_added} new transactions to Revolut sheet.")
-        print(f"Found {duplicates_found} duplicates (added to 'Duplicates' sheet).")
+        log.info(f"Adding {new_transactions_added} new account statement transactions to Revolut sheet...")
+        
+        log.info(f"Account statement processing completed!")
+        log.info(f"Added {new_transactions_added} new transactions to Revolut sheet.")
+        log.info(f"Found {duplicates_found} duplicates (added to 'Duplicates' sheet).")
+        
+        return new_transactions_added + duplicates_found
         
     except Exception as e:
-        print(f"Error processing account statements: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"Error processing account statements: {str(e)}")
+        return None
 
-def process_bank_statements():
+def process_bank_statements(workbook):
     """
     Process bank statements from LISTE DES OPÉRATIONS files
+    New transactions are added to the BCV sheet of the given workbook
+    Returns the number of rows written, 0 if the workbook was left untouched,
+    or None if processing failed after writing to it had started
     """
     # Find input file with bracket pattern [dd-mm-yyyy]
-    input_files = glob.glob("LISTE DES OPÉRATIONS *.xlsx")
-    
-    # Filter files that actually contain brackets in the name
-    bracket_files = [f for f in input_files if '[' in f and ']' in f]
+    bracket_files = find_bank_statement_files()
     
     if not bracket_files:
-        print("No bank statement files found matching pattern 'LISTE DES OPÉRATIONS [*].xlsx'")
-        return
+        log.info("No bank statement files found matching pattern 'LISTE DES OPÉRATIONS [*].xlsx'")
+        return 0
     
     # Use the first matching file as input
     input_file = bracket_files[0]
-    print(f"Using input file: {input_file}")
-    
-    # Use hardcoded output file
-    output_file = "LISTE DES OPÉRATIONS-2025.xlsm"
-    
-    if not os.path.exists(output_file):
-        print(f"Output file {output_file} not found!")
-        return
-    
-    print(f"Using output file: {output_file}")
+    log.info(f"Using input file: {input_file}")
     
+    # Set once the workbook is modified, a failure before that leaves it untouched
+    started_writing = False
     try:
-        print(f"Processing {input_file}...")
+        log.info(f"Processing {input_file}...")
         
         # Read bank statement input file with correct header row
-        df = pd.read_excel(input_file, header=8)  # Row 9 contains data
-
-        # Load output Excel file
-        print(f"Loading {output_file}...")
-        workbook = openpyxl.load_workbook(output_file, keep_vba=True)
+        df = read_bank_statement(input_file)
         
         # Check 2025 worksheet to get the latest transaction date
         latest_date = None
@@ -429,8 +747,7 @@ def process_bank_statements():
         if sheet_2025_name in workbook.sheetnames:
             sheet_2025 = workbook[sheet_2025_name]
             # Find the latest date in column A of 2025 worksheet
-            for row in range(2, sheet_2025.max_row + 1):  # Skip header row
-                date_val = sheet_2025[f'A{row}'].value
+            for (date_val,) in sheet_2025.iter_rows(min_row=2, max_col=1, values_only=True):  # Skip header row
                 if date_val:
                     try:
                         if isinstance(date_val, datetime):
@@ -444,314 +761,235 @@ def process_bank_statements():
                         continue
         
         if latest_date:
-            print(f"Found latest date in 2025 worksheet: {latest_date.strftime('%d.%m.%Y')}")
-            print(f"Will only process transactions after this date")
+            log.info(f"Found latest date in 2025 worksheet: {format_display_date(latest_date)}")
+            log.info(f"Will only process transactions after this date")
         else:
-            print("No existing dates found in 2025 worksheet, will process all transactions")
+            log.info("No existing dates found in 2025 worksheet, will process all transactions")
           
+        # Parse dates from column A in one pass with the same formats as parse_date
+        execution_dates = parse_date_column(df.iloc[:, 0])
+        
+        # Get debit from column C and credit from column D as separate values
+        debits = df.iloc[:, 2].fillna(0)  # Column C - Débit
+        credits = df.iloc[:, 3].fillna(0)  # Column D - Crédit
+        
+        # Filter whole columns: skip rows without a date or operation (column B),
+        # or where both debit and credit are zero
+        has_data = execution_dates.notna() & df.iloc[:, 1].notna() & ~((debits == 0) & (credits == 0))
+        
+        # Only add transactions after the latest date from 2025 worksheet
+        if latest_date is None:
+            is_new = has_data
+        else:
+            is_new = has_data & (execution_dates > latest_date)
+            for execution_date in execution_dates[has_data & ~is_new]:
+                log.info(f"Skipping transaction from {format_display_date(execution_date)} (before latest date)")
+        
+        rows = pd.DataFrame({
+            'date': execution_dates,
+            'operation': df.iloc[:, 1],  # Column B - Opérations
+            'debit': debits,
+            'credit': credits
+        })[is_new]
+        
         # Process bank transactions
         bank_transactions = []
-        for index, row in df.iterrows():
-                try:
-                    # Parse date - get from column A (index 0)
-                    execution_date = row.iloc[0]  # Column A
-                    if pd.isna(execution_date):
-                        continue
-                        
-                    # Use the parse_date function for consistent date parsing
-                    execution_date = parse_date(execution_date)
-                    if execution_date is None:
-                        continue
-                    
-                    operation = row.iloc[1]  # Column B - Opérations
-                    if pd.isna(operation):
-                        continue
-                        
-                    # Get debit from column C and credit from column D as separate values
-                    debit = row.iloc[2] if pd.notna(row.iloc[2]) else 0  # Column C - Débit
-                    credit = row.iloc[3] if pd.notna(row.iloc[3]) else 0  # Column D - Crédit
-                    
-                    # Skip if both debit and credit are zero
-                    if debit == 0 and credit == 0:
-                        continue
-                    
-                    # Clean operation and get category
-                    cleaned_operation, category, sub_category = clean_bank_operation_and_categorize(operation)
-                    
-                    # Only add transaction if it's after the latest date from 2025 worksheet
-                    if latest_date is None or execution_date > latest_date:
-                        bank_transactions.append({
-                            'date': execution_date,
-                            'operation': cleaned_operation,
-                            'debit': float(debit) if debit != 0 else 0,
-                            'credit': float(credit) if credit != 0 else 0,
-                            'category': category,
-                            'sub_category': sub_category
-                        })
-                    else:
-                        print(f"Skipping transaction from {execution_date.strftime('%d.%m.%Y')} (before latest date)")
-                    
-                except Exception as e:
-                    print(f"Error processing row {index}: {e}")
-                    continue
+        for index, execution_date, operation, debit, credit in rows.itertuples(name=None):
+            try:
+                # Clean operation and get category
+                cleaned_operation, category, sub_category = clean_bank_operation_and_categorize(operation)
+                
+                debit = float(debit)
+                credit = float(credit)
+                
+                # Build the duplicate-check key (yyyy-mm-dd date) and the dd.mm.yyyy date once per day
+                date_iso, date_disp = format_dates(execution_date)
+                bank_transactions.append({
+                    'date': execution_date,
+                    'key': make_key(date_iso, cleaned_operation, debit, credit),
+                    'date_disp': date_disp,
+                    'operation': cleaned_operation,
+                    'debit': debit,
+                    'credit': credit,
+                    'category': category or None,
+                    'sub_category': sub_category or None
+                })
+                
+            except Exception as e:
+                log.error(f"Error processing row {index}: {e}")
+                continue
         
-        print(f"Processed {len(bank_transactions)} bank transactions from input file")
+        log.info(f"Processed {len(bank_transactions)} bank transactions from input file")
         
         if not bank_transactions:
-            print("No bank transactions found to process")
-            return
+            log.info("No bank transactions found to process")
+            return 0
         
         # Sort transactions from newest to oldest
         bank_transactions.sort(key=lambda x: x['date'], reverse=True)
 
         # Get or create the BCV worksheet
+        started_writing = True
         sheet_bcv_name = "BCV"
-        if sheet_bcv_name in workbook.sheetnames:
+        is_new_sheet = sheet_bcv_name not in workbook.sheetnames
+        if not is_new_sheet:
             sheet_bcv = workbook[sheet_bcv_name]
         else:
             sheet_bcv = workbook.create_sheet(sheet_bcv_name)
             # Add headers to BCV sheet
-            sheet_bcv['A1'] = "Date"
-            sheet_bcv['B1'] = "Operation"
-            sheet_bcv['C1'] = "Debit"
-            sheet_bcv['D1'] = "Credit"
-            sheet_bcv['E1'] = "Category"
-            sheet_bcv['F1'] = "Sub Category"
-        
-        # Get existing data from BCV tab for duplicate check
-        existing_data = set()
-        for row in range(1, sheet_bcv.max_row + 1):
-            date_val = sheet_bcv[f'A{row}'].value
-            operation_val = sheet_bcv[f'B{row}'].value
-            debit_val = sheet_bcv[f'C{row}'].value
-            credit_val = sheet_bcv[f'D{row}'].value
-            
-            if date_val and operation_val and (debit_val or credit_val):
-                # Skip header row or non-numeric amounts
-                try:
-                    debit_float = float(debit_val) if debit_val else 0
-                    credit_float = float(credit_val) if credit_val else 0
-                except (ValueError, TypeError):
-                    continue
-                
-                # Convert date to string for comparison
-                if isinstance(date_val, datetime):
-                    date_str = date_val.strftime("%Y-%m-%d")
-                else:
-                    date_str = str(date_val)
-                
-                existing_data.add((date_str, str(operation_val), debit_float, credit_float))
+            sheet_bcv.append(["Date", "Operation", "Debit", "Credit", "Category", "Sub Category"])
         
         # Find the last row with data in BCV tab
-        last_row_bcv = 1
-        for row in range(1, sheet_bcv.max_row + 1):
-            if sheet_bcv[f'A{row}'].value is not None:
-                last_row_bcv = row
+        last_row_bcv = find_last_row(sheet_bcv)
+        
+        # Get existing data from BCV tab for duplicate check (debit and credit columns),
+        # only as far back as the oldest transaction
+        oldest_transaction_date = bank_transactions[-1]['date'].date()
+        existing_data = load_existing_keys(sheet_bcv, amount_columns=2, max_row=last_row_bcv, min_date=oldest_transaction_date)
         
         # Add new transactions (avoiding duplicates)
-        new_transactions_added = 0
-        duplicates_skipped = 0
         next_row = last_row_bcv + 1
         
-        # Find oldest transaction date among new transactions to add
-        new_bank_transactions_to_add = []
+        # Key new transactions by their duplicate-check key in a single pass,
+        # skipping repeats of an existing or already accepted key
+        new_transactions = {}
         for transaction in bank_transactions:
-            trans_tuple = (
-                transaction['date'].strftime("%Y-%m-%d"),
-                transaction['operation'],
-                float(transaction['debit']),
-                float(transaction['credit'])
-            )
-            if trans_tuple not in existing_data:
-                new_bank_transactions_to_add.append(transaction)
+            key = transaction['key']
+            if key not in existing_data:
+                new_transactions.setdefault(key, transaction)
         
-        oldest_bank_date = min([t['date'] for t in new_bank_transactions_to_add]) if new_bank_transactions_to_add else None
+        new_transactions_added = len(new_transactions)
+        duplicates_skipped = len(bank_transactions) - new_transactions_added
         
-        for transaction in bank_transactions:
-            # Create tuple for duplicate check
-            trans_tuple = (
-                transaction['date'].strftime("%Y-%m-%d"),
+        # Find oldest transaction date among new transactions to add
+        oldest_bank_date = min((t['date'] for t in new_transactions.values()), default=None)
+        
+        # Add to BCV sheet with dd.mm.yyyy format, categories only if they exist
+        bold_rows = []
+        for transaction in new_transactions.values():
+            row_values = (
+                transaction['date_disp'],
                 transaction['operation'],
-                float(transaction['debit']),
-                float(transaction['credit'])
+                transaction['debit'] if transaction['debit'] != 0 else "",
+                transaction['credit'] if transaction['credit'] != 0 else "",
+                transaction['category'],
+                transaction['sub_category']
             )
+            write_row(sheet_bcv, next_row, row_values, append=is_new_sheet, number_format='@')  # Force text format on the date
+            remember_sheet_row(sheet_bcv, next_row, row_values, amount_columns=2)
             
-            # Check if duplicate
-            if trans_tuple in existing_data:
-                duplicates_skipped += 1
-                continue
-            
-            # Add to BCV sheet with dd.mm.yyyy format
-            date_str = transaction['date'].strftime("%d.%m.%Y")
-            sheet_bcv[f'A{next_row}'] = date_str
-            sheet_bcv[f'A{next_row}'].number_format = '@'  # Force text format
-            
-            sheet_bcv[f'B{next_row}'] = transaction['operation']
-            sheet_bcv[f'C{next_row}'] = transaction['debit'] if transaction['debit'] != 0 else ""
-            sheet_bcv[f'D{next_row}'] = transaction['credit'] if transaction['credit'] != 0 else ""
-            
-            if transaction['category']:
-                sheet_bcv[f'E{next_row}'] = transaction['category']
-            
-            if transaction['sub_category']:
-                sheet_bcv[f'F{next_row}'] = transaction['sub_category']
-            
-            # Make oldest transactions bold
-            if oldest_bank_date and transaction['date'] == oldest_bank_date:
-                from openpyxl.styles import Font
-                bold_font = Font(bold=True)
-                sheet_bcv[f'A{next_row}'].font = bold_font
-                sheet_bcv[f'B{next_row}'].font = bold_font
-                sheet_bcv[f'C{next_row}'].font = bold_font
-                sheet_bcv[f'D{next_row}'].font = bold_font
-                sheet_bcv[f'E{next_row}'].font = bold_font
-                sheet_bcv[f'F{next_row}'].font = bold_font
-            
-            existing_data.add(trans_tuple)
-            new_transactions_added += 1
+            if transaction['date'] == oldest_bank_date:
+                bold_rows.append((next_row, range(1, 7)))
             next_row += 1
         
-        # Save the workbook
-        print(f"Adding {new_transactions_added} new bank transactions to '{sheet_bcv_name}' sheet...")
-        workbook.save(output_file)
-        workbook.close()
+        # Make oldest transactions bold
+        make_rows_bold(sheet_bcv, bold_rows)
+        
+        log.info(f"Adding {new_transactions_added} new bank transactions to '{sheet_bcv_name}' sheet...")
         
-        print(f"Bank statement processing completed!")
-        print(f"Added {new_transactions_added} new transactions to BCV tab.")
-        print(f"Skipped {duplicates_skipped} duplicates.")
+        log.info(f"Bank statement processing completed!")
+        log.info(f"Added {new_transactions_added} new transactions to BCV tab.")
+        log.info(f"Skipped {duplicates_skipped} duplicates.")
+        
+        return new_transactions_added
         
     except Exception as e:
-        print(f"Error processing bank statements: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"Error processing bank statements: {str(e)}")
+        return None if started_writing else 0
 
-def process_transactions():
+def process_transactions(workbook):
     """
-    Main function to process transactions from CSV and update Excel file
+    Process credit card transactions from CSV
+    New transactions are added to the Carte Cred sheet of the given workbook
+    Returns the number of rows written, 0 if the workbook was left untouched,
+    or None if processing failed after writing to it had started
     """
     # File paths
-    csv_file = "transactions.csv"
-    
-    # Use hardcoded Excel file
-    excel_file = "LISTE DES OPÉRATIONS-2025.xlsm"
-    
-    if not os.path.exists(excel_file):
-        print(f"Excel file {excel_file} not found!")
-        return
-    
-    print(f"Using Excel file: {excel_file}")
+    csv_file = TRANSACTIONS_FILE
     
     # Check if files exist
     if not os.path.exists(csv_file):
-        print(f"Error: {csv_file} not found!")
-        return
+        log.error(f"Error: {csv_file} not found!")
+        return 0
     
+    # Set once the workbook is modified, a failure before that leaves it untouched
+    started_writing = False
     try:
         # Read CSV file
-        print("Reading transactions.csv...")
-        df = pd.read_csv(csv_file)
+        log.info("Reading transactions.csv...")
+        df = read_statement_csv(csv_file, TRANSACTION_COLUMNS)
+        
+        # Parse booking dates with the same formats as parse_date, and amounts in one pass
+        amounts = pd.to_numeric(df['Amount (CHF)'], errors="coerce")
+        # If type is Credit, make amount negative
+        is_credit = df['Type'].astype(str).str.contains('Credit', regex=False, na=False).to_numpy()
+        df = df.assign(
+            booking_date=parse_date_column(df['Booking date']),
+            signed_amount=np.where(is_credit, -amounts, amounts)
+        )
         
         # Extract required columns
         transactions = []
-        for _, row in df.iterrows():
-            # Parse booking date using the improved parse_date function
-            booking_date = parse_date(row['Booking date'])
-            if booking_date is None:
-                print(f"Warning: Could not parse date '{row['Booking date']}'")
+        for booking_date, booking_date_str, merchant, amount in df[['booking_date', 'Booking date', 'Merchant', 'signed_amount']].itertuples(index=False, name=None):
+            if pd.isna(booking_date):
+                log.warning(f"Warning: Could not parse date '{booking_date_str}'")
                 continue
             
-            merchant = row['Merchant']
-            transaction_type = row['Type']
-            
-            # Parse amount, handling potential string formatting
-            try:
-                amount = float(row['Amount (CHF)'])
-                # If type is Credit, make amount negative
-                if 'Credit' in str(transaction_type):
-                    amount = -amount
-            except (ValueError, TypeError):
+            # Skip amounts that could not be parsed
+            if pd.isna(amount):
                 continue
             
             # Clean merchant and get category
             cleaned_merchant, category = clean_merchant_and_categorize(merchant)
             
+            # Build the duplicate-check key (yyyy-mm-dd date) and the dd.mm.yyyy date once per day
+            date_iso, date_disp = format_dates(booking_date)
             transactions.append({
                 'date': booking_date,
+                'key': make_key(date_iso, cleaned_merchant, amount),
+                'date_disp': date_disp,
                 'merchant': cleaned_merchant,
                 'amount': amount,
-                'category': category
+                'category': category or None
             })
         
-        print(f"Processed {len(transactions)} transactions from CSV")
+        log.info(f"Processed {len(transactions)} transactions from CSV")
         
         # Sort transactions from newest to oldest
         transactions.sort(key=lambda x: x['date'], reverse=True)
         
-        # Load Excel file
-        print(f"Loading {excel_file}...")
-        workbook = openpyxl.load_workbook(excel_file, keep_vba=True)
-        
         # Create or get Carte Cred worksheet
+        started_writing = True
         carte_cred_sheet_name = "Carte Cred"
-        if carte_cred_sheet_name in workbook.sheetnames:
+        is_new_sheet = carte_cred_sheet_name not in workbook.sheetnames
+        if not is_new_sheet:
             worksheet = workbook[carte_cred_sheet_name]
         else:
             worksheet = workbook.create_sheet(carte_cred_sheet_name)
             # Add headers to Carte Cred sheet
-            worksheet['A1'] = "Date"
-            worksheet['B1'] = "Merchant"
-            worksheet['C1'] = "Amount"
-            worksheet['D1'] = "Empty"
-            worksheet['E1'] = "Category"
+            worksheet.append(["Date", "Merchant", "Amount", "Empty", "Category"])
         
         # Create or get duplicates worksheet
         duplicate_sheet_name = "Duplicates"
-        if duplicate_sheet_name in workbook.sheetnames:
+        is_new_duplicate_sheet = duplicate_sheet_name not in workbook.sheetnames
+        if not is_new_duplicate_sheet:
             duplicate_worksheet = workbook[duplicate_sheet_name]
         else:
             duplicate_worksheet = workbook.create_sheet(duplicate_sheet_name)
             # Add headers to duplicate sheet
-            duplicate_worksheet['A1'] = "Date"
-            duplicate_worksheet['B1'] = "Merchant"
-            duplicate_worksheet['C1'] = "Amount"
-            duplicate_worksheet['D1'] = "Empty"
-            duplicate_worksheet['E1'] = "Category"
+            duplicate_worksheet.append(["Date", "Merchant", "Amount", "Empty", "Category"])
         
         # Find the last row with data in column A
-        last_row = 1
-        for row in range(1, worksheet.max_row + 1):
-            if worksheet[f'A{row}'].value is not None:
-                last_row = row
-        
-        print(f"Found {last_row} existing rows in Excel")
-        
-        # Get existing data for duplicate check
-        existing_data = set()
-        for row in range(1, last_row + 1):
-            date_val = worksheet[f'A{row}'].value
-            merchant_val = worksheet[f'B{row}'].value
-            amount_val = worksheet[f'C{row}'].value
-            
-            if date_val and merchant_val and amount_val:
-                # Skip header row or non-numeric amounts
-                try:
-                    amount_float = float(amount_val)
-                except (ValueError, TypeError):
-                    continue
-                
-                # Convert date to string for comparison
-                if isinstance(date_val, datetime):
-                    date_str = date_val.strftime("%Y-%m-%d")
-                else:
-                    date_str = str(date_val)
-                
-                existing_data.add((date_str, str(merchant_val), amount_float))
+        last_row = find_last_row(worksheet)
+        
+        log.info(f"Found {last_row} existing rows in Excel")
+        
+        # Get existing data for duplicate check, only as far back as the oldest transaction
+        oldest_transaction_date = transactions[-1]['date'].date() if transactions else None
+        existing_data = load_existing_keys(worksheet, amount_columns=1, max_row=last_row, min_date=oldest_transaction_date)
         
         # Find last row in duplicate sheet
-        duplicate_last_row = 1
-        for row in range(1, duplicate_worksheet.max_row + 1):
-            if duplicate_worksheet[f'A{row}'].value is not None:
-                duplicate_last_row = row
+        duplicate_last_row = find_last_row(duplicate_worksheet)
         
         # Add new transactions (avoiding duplicates)
         new_transactions_added = 0
@@ -759,89 +997,128 @@ def process_transactions():
         next_row = last_row + 1
         next_duplicate_row = duplicate_last_row + 1
         
-        # Find oldest transaction date among new transactions to add
-        new_cc_transactions_to_add = []
-        for transaction in transactions:
-            trans_tuple = (
-                transaction['date'].strftime("%Y-%m-%d"),
-                transaction['merchant'],
-                float(transaction['amount'])
-            )
-            if trans_tuple not in existing_data:
-                new_cc_transactions_to_add.append(transaction)
-        
-        oldest_cc_date = min([t['date'] for t in new_cc_transactions_to_add]) if new_cc_transactions_to_add else None
+        # Track the oldest new transaction date and its rows while adding
+        oldest_cc_date = None
+        bold_rows = []
         
         for transaction in transactions:
-            # Create tuple for duplicate check
-            trans_tuple = (
-                transaction['date'].strftime("%Y-%m-%d"),
-                transaction['merchant'],
-                float(transaction['amount'])
-            )
+            trans_key = transaction['key']
             
             # Check if duplicate
-            if trans_tuple in existing_data:
+            if trans_key in existing_data:
                 # Add to duplicate sheet
-                date_str = transaction['date'].strftime("%d.%m.%Y")
-                duplicate_worksheet[f'A{next_duplicate_row}'] = date_str
-                duplicate_worksheet[f'A{next_duplicate_row}'].number_format = '@'  # Force text format
-                
-                duplicate_worksheet[f'B{next_duplicate_row}'] = transaction['merchant']
-                duplicate_worksheet[f'C{next_duplicate_row}'] = transaction['amount']
-                duplicate_worksheet[f'D{next_duplicate_row}'] = transaction['category']
-                duplicate_worksheet[f'E{next_duplicate_row}'] = "Duplicate entry"
+                write_row(duplicate_worksheet, next_duplicate_row, (
+                    transaction['date_disp'],
+                    transaction['merchant'],
+                    transaction['amount'],
+                    transaction['category'],
+                    "Duplicate entry"
+                ), append=is_new_duplicate_sheet, number_format='@')  # Force text format on the date
                 duplicates_found += 1
                 next_duplicate_row += 1
                 continue
             
-            # Add to main Excel sheet with dd.mm.yyyy format
-            date_str = transaction['date'].strftime("%d.%m.%Y")
-            worksheet[f'A{next_row}'] = date_str
-            worksheet[f'A{next_row}'].number_format = '@'  # Force text format
-            
-            worksheet[f'B{next_row}'] = transaction['merchant']
-            worksheet[f'C{next_row}'] = transaction['amount']
-            
-            # Add category in column E if it exists
-            if transaction['category']:
-                worksheet[f'E{next_row}'] = transaction['category']
+            # Add to main Excel sheet with dd.mm.yyyy format, category in column E if it exists
+            row_values = (
+                transaction['date_disp'],
+                transaction['merchant'],
+                transaction['amount'],
+                None,
+                transaction['category']
+            )
+            write_row(worksheet, next_row, row_values, append=is_new_sheet, number_format='@')  # Force text format on the date
+            remember_sheet_row(worksheet, next_row, row_values, amount_columns=1)
             
-            # Make oldest transactions bold
-            if oldest_cc_date and transaction['date'] == oldest_cc_date:
-                from openpyxl.styles import Font
-                bold_font = Font(bold=True)
-                worksheet[f'A{next_row}'].font = bold_font
-                worksheet[f'B{next_row}'].font = bold_font
-                worksheet[f'C{next_row}'].font = bold_font
-                if transaction['category']:
-                    worksheet[f'E{next_row}'].font = bold_font
+            # Remember the rows of the oldest date, starting over when an older one shows up,
+            # category only bold if it exists
+            bold_columns = (1, 2, 3) if transaction['category'] is None else (1, 2, 3, 5)
+            if oldest_cc_date is None or transaction['date'] < oldest_cc_date:
+                oldest_cc_date = transaction['date']
+                bold_rows = [(next_row, bold_columns)]
+            elif transaction['date'] == oldest_cc_date:
+                bold_rows.append((next_row, bold_columns))
             
-            existing_data.add(trans_tuple)
+            existing_data.add(trans_key)
             new_transactions_added += 1
             next_row += 1
         
-        # Save the workbook
-        print(f"Adding {new_transactions_added} new transactions to Carte Cred sheet...")
+        # Make oldest transactions bold
+        make_rows_bold(worksheet, bold_rows)
+        
+        log.info(f"Adding {new_transactions_added} new transactions to Carte Cred sheet...")
+        
+        log.info(f"Successfully processed! Added {new_transactions_added} new transactions to Carte Cred sheet.")
+        log.info(f"Found {duplicates_found} duplicates (added to 'Duplicates' sheet).")
+        log.info(f"Total rows in Carte Cred sheet: {next_row - 1}")
+        log.info(f"Total rows in duplicates sheet: {next_duplicate_row - 1}")
+        
+        return new_transactions_added + duplicates_found
+        
+    except Exception as e:
+        log.exception(f"Error processing transactions: {str(e)}")
+        return None if started_writing else 0
+
+def run_all(parallel=False):
+    """
+    Main function to process all statements and update Excel file
+    The workbook is loaded once, shared by every processor and saved once at the end
+    With parallel, the input files are read in worker processes while the workbook loads
+    """
+    excel_file = EXCEL_FILE
+    
+    if not os.path.exists(excel_file):
+        log.error(f"Excel file {excel_file} not found!")
+        return
+    
+    log.info(f"Using Excel file: {excel_file}")
+    
+    try:
+        # Load Excel file, the processors all update it so with parallel only the input
+        # files are read in worker processes, while the workbook loads
+        log.info(f"Loading {excel_file}...")
+        if parallel:
+            with ProcessPoolExecutor() as executor:
+                futures = preload_statements(executor)
+                workbook = openpyxl.load_workbook(excel_file, keep_vba=True)
+                store_preloaded_statements(futures)
+        else:
+            workbook = openpyxl.load_workbook(excel_file, keep_vba=True)
+        load_sheet_state(excel_file)
+        
+        log.info("\nProcessing bank statements...")
+        rows_written = [process_bank_statements(workbook)]
+        
+        log.info("Processing credit card transactions...")
+        rows_written.append(process_transactions(workbook))
+        
+        log.info("\nProcessing account statements...")
+        rows_written.append(process_account_statements(workbook))
+        
+        # A processor that failed partway through writing returns None, saving would keep
+        # its partial rows, so the file on disk is left as it was
+        if None in rows_written:
+            log.error(f"\nA processor failed while writing, {excel_file} was not saved")
+            workbook.close()
+            return
+        
+        # Skip the save when no processor wrote a row
+        if all(count == 0 for count in rows_written):
+            log.info(f"\nNo changes, skipping save of {excel_file}")
+            workbook.close()
+            # The file is unchanged, the keys scanned this run still match it
+            save_sheet_state(excel_file)
+            return
+        
+        # Save the workbook, through openpyxl since it updates the file in place, a streaming
+        # writer like xlsxwriter can only create new files and would lose the macros and styles
+        log.info(f"\nSaving {excel_file}...")
         workbook.save(excel_file)
         workbook.close()
-        
-        print(f"Successfully processed! Added {new_transactions_added} new transactions to Carte Cred sheet.")
-        print(f"Found {duplicates_found} duplicates (added to 'Duplicates' sheet).")
-        print(f"Total rows in Carte Cred sheet: {next_row - 1}")
-        print(f"Total rows in duplicates sheet: {next_duplicate_row - 1}")
+        save_sheet_state(excel_file)
         
     except Exception as e:
-        print(f"Error processing transactions: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"Error updating {excel_file}: {str(e)}")
 
 if __name__ == "__main__":
-    print("\nProcessing bank statements...")
-    process_bank_statements()
-
-    print("Processing credit card transactions...")
-    process_transactions()
-        
-    print("\nProcessing account statements...")
-    process_account_statements()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    run_all(parallel="--parallel" in sys.argv[1:])